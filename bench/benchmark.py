@@ -5,141 +5,274 @@ Measures end-to-end latency, FPS, and bandwidth usage
 """
 
 import asyncio
-import json
+import sys
 import time
 import argparse
-import statistics
 import psutil
 import requests
-from typing import List, Dict
+from typing import Dict, Optional, Tuple
 import websockets
 import cv2
 import numpy as np
+import orjson
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    from hdrh.histogram import HdrHistogram
+except ImportError:
+    HdrHistogram = None
+
+# Above this many samples, percentiles come from the HDR histogram. It
+# tracks latencies of 0 ms to 1 h at 3 significant digits; a run with a
+# latency outside that range keeps using np.percentile instead
+HDR_SAMPLE_THRESHOLD = 100_000
+HDR_MAX_LATENCY_MS = 3_600_000
+
+
+def _median_mean(values: np.ndarray) -> Optional[Dict]:
+    """Median and mean of samples, or None if there are none"""
+    if values.size == 0:
+        return None
+    return {
+        "median": round(float(np.median(values)), 2),
+        "mean": round(float(values.mean()), 2),
+    }
+
+
+def _mean_max(values: np.ndarray) -> Optional[Dict]:
+    """Mean and max of samples, or None if there are none"""
+    if values.size == 0:
+        return None
+    return {
+        "mean": round(float(values.mean()), 2),
+        "max": round(float(values.max()), 2),
+    }
 
 
 class BenchmarkMetrics:
-    def __init__(self):
-        self.latencies: List[float] = []
-        self.server_latencies: List[float] = []
-        self.network_latencies: List[float] = []
-        self.frame_times: List[float] = []
-        self.cpu_usage: List[float] = []
-        self.memory_usage: List[float] = []
-        self.bandwidth_up: List[float] = []
-        self.bandwidth_down: List[float] = []
+    def __init__(self, max_samples: int = 1024):
+        # Samples live in preallocated arrays; only the first _n (per-frame)
+        # or _n_sys (per-second) entries are valid
+        self._n = 0
+        self.latencies = np.empty(max_samples, dtype=np.float64)
+        self.server_latencies = np.empty(max_samples, dtype=np.float64)
+        self.network_latencies = np.empty(max_samples, dtype=np.float64)
+        self.frame_times = np.empty(max_samples, dtype=np.float64)
+        # Local monotonic ms minus the server's clock_ref, so server
+        # timestamps can be compared with local ones
+        self.clock_offset_ms = 0
+
+        self._n_sys = 0
+        self.cpu_usage = np.empty(max_samples, dtype=np.float64)
+        self.memory_usage = np.empty(max_samples, dtype=np.float64)
+        self.bandwidth_up = np.empty(max_samples, dtype=np.float64)
+        self.bandwidth_down = np.empty(max_samples, dtype=np.float64)
+
+        # On Linux, system metrics are parsed straight from /proc through
+        # file handles kept open for the whole run; elsewhere psutil is used
+        self._proc_files = None
+        self._prev_cpu_times = None
+        if sys.platform.startswith("linux"):
+            try:
+                self._proc_files = (
+                    open("/proc/stat", "rb"),
+                    open("/proc/meminfo", "rb"),
+                    open("/proc/net/dev", "rb"),
+                )
+            except OSError:
+                self._proc_files = None
+
+        # Created (and backfilled) once the run crosses HDR_SAMPLE_THRESHOLD
+        self.latency_histogram = None
+        self._hdr_enabled = HdrHistogram is not None
+
+    def _grow_frame_arrays(self):
+        """Double the capacity of the per-frame arrays"""
+        size = self.latencies.size * 2
+        self.latencies = np.resize(self.latencies, size)
+        self.server_latencies = np.resize(self.server_latencies, size)
+        self.network_latencies = np.resize(self.network_latencies, size)
+        self.frame_times = np.resize(self.frame_times, size)
+
+    def _grow_system_arrays(self):
+        """Double the capacity of the per-second arrays"""
+        size = self.cpu_usage.size * 2
+        self.cpu_usage = np.resize(self.cpu_usage, size)
+        self.memory_usage = np.resize(self.memory_usage, size)
+        self.bandwidth_up = np.resize(self.bandwidth_up, size)
+        self.bandwidth_down = np.resize(self.bandwidth_down, size)
 
     def add_frame_metrics(self, result: Dict):
         """Add metrics from a detection result"""
-        now = time.time() * 1000
+        now = time.monotonic_ns() // 1_000_000 - self.clock_offset_ms
+        if self._n == self.latencies.size:
+            self._grow_frame_arrays()
+        n = self._n
 
         # End-to-end latency
         e2e_latency = now - result["capture_ts"]
-        self.latencies.append(e2e_latency)
+        self.latencies[n] = e2e_latency
+        if self._hdr_enabled and n >= HDR_SAMPLE_THRESHOLD:
+            if self.latency_histogram is None:
+                self.latency_histogram = HdrHistogram(1, HDR_MAX_LATENCY_MS, 3)
+                self._record_hdr(self.latencies[: n + 1].tolist())
+            else:
+                self._record_hdr((e2e_latency,))
 
         # Server latency
-        server_latency = result["inference_ts"] - result["recv_ts"]
-        self.server_latencies.append(server_latency)
+        self.server_latencies[n] = result["inference_ts"] - result["recv_ts"]
 
         # Network latency
-        network_latency = result["recv_ts"] - result["capture_ts"]
-        self.network_latencies.append(network_latency)
+        self.network_latencies[n] = result["recv_ts"] - result["capture_ts"]
 
         # Frame processing time
-        self.frame_times.append(now)
+        self.frame_times[n] = now
+        self._n = n + 1
+
+    def _record_hdr(self, latencies):
+        """Record whole-ms latencies, abandoning the histogram on out-of-range"""
+        for latency in latencies:
+            value = round(latency)
+            if not 0 <= value <= HDR_MAX_LATENCY_MS:
+                self.latency_histogram = None
+                self._hdr_enabled = False
+                return
+            self.latency_histogram.record_value(value)
 
     def add_system_metrics(self):
         """Add system resource metrics"""
-        self.cpu_usage.append(psutil.cpu_percent())
-        self.memory_usage.append(psutil.virtual_memory().percent)
+        if self._n_sys == self.cpu_usage.size:
+            self._grow_system_arrays()
+        n = self._n_sys
+
+        if self._proc_files is not None:
+            cpu, memory, bytes_sent, bytes_recv = self._read_proc_metrics()
+        else:
+            cpu = psutil.cpu_percent()
+            memory = psutil.virtual_memory().percent
+            net_io = psutil.net_io_counters()
+            bytes_sent, bytes_recv = net_io.bytes_sent, net_io.bytes_recv
+
+        self.cpu_usage[n] = cpu
+        self.memory_usage[n] = memory
 
         # Network I/O
-        net_io = psutil.net_io_counters()
-        self.bandwidth_up.append(net_io.bytes_sent)
-        self.bandwidth_down.append(net_io.bytes_recv)
+        self.bandwidth_up[n] = bytes_sent
+        self.bandwidth_down[n] = bytes_recv
+        self._n_sys = n + 1
+
+    def _read_proc_metrics(self) -> Tuple[float, float, int, int]:
+        """Read CPU %, memory % and total network bytes from /proc"""
+        f_stat, f_meminfo, f_net = self._proc_files
+
+        # CPU: aggregate "cpu" line, percent busy since the previous sample
+        f_stat.seek(0)
+        fields = f_stat.read().split(b"\n", 1)[0].split()[1:9]
+        times = [int(v) for v in fields]
+        idle = times[3] + times[4]  # idle + iowait
+        total = sum(times)
+        cpu = 0.0
+        if self._prev_cpu_times is not None:
+            prev_idle, prev_total = self._prev_cpu_times
+            delta_total = total - prev_total
+            if delta_total > 0:
+                cpu = 100.0 * (1 - (idle - prev_idle) / delta_total)
+        self._prev_cpu_times = (idle, total)
+
+        # Memory: same definition as psutil (total - available) / total
+        f_meminfo.seek(0)
+        mem_total = mem_available = 0
+        for line in f_meminfo.read().split(b"\n"):
+            if line.startswith(b"MemTotal:"):
+                mem_total = int(line.split()[1])
+            elif line.startswith(b"MemAvailable:"):
+                mem_available = int(line.split()[1])
+                break
+        memory = 100.0 * (mem_total - mem_available) / mem_total if mem_total else 0.0
+
+        # Network: sum over all interfaces, skipping the two header lines
+        f_net.seek(0)
+        bytes_recv = bytes_sent = 0
+        for line in f_net.read().split(b"\n")[2:]:
+            if b":" not in line:
+                continue
+            counters = line.split(b":", 1)[1].split()
+            bytes_recv += int(counters[0])
+            bytes_sent += int(counters[8])
+
+        return cpu, memory, bytes_sent, bytes_recv
+
+    def close(self):
+        """Close any /proc file handles"""
+        if self._proc_files is not None:
+            for f in self._proc_files:
+                f.close()
+            self._proc_files = None
 
     def calculate_fps(self) -> float:
         """Calculate processed FPS"""
-        if len(self.frame_times) < 2:
+        if self._n < 2:
             return 0.0
 
         duration = (
-            self.frame_times[-1] - self.frame_times[0]
+            self.frame_times[self._n - 1] - self.frame_times[0]
         ) / 1000  # Convert to seconds
-        return len(self.frame_times) / duration if duration > 0 else 0.0
+        return float(self._n / duration) if duration > 0 else 0.0
 
     def get_summary(self) -> Dict:
         """Get benchmark summary"""
-        if not self.latencies:
+        n, n_sys = self._n, self._n_sys
+        if n == 0:
             return {"error": "No metrics collected"}
 
         # Calculate bandwidth (bytes per second) over monitoring samples
         bw_up = 0
         bw_down = 0
-        if len(self.bandwidth_up) >= 2:
-            elapsed = max(1, len(self.bandwidth_up) - 1)
-            bw_up = (self.bandwidth_up[-1] - self.bandwidth_up[0]) / elapsed
-            bw_down = (self.bandwidth_down[-1] - self.bandwidth_down[0]) / elapsed
+        if n_sys >= 2:
+            elapsed = max(1, n_sys - 1)
+            bw_up = (self.bandwidth_up[n_sys - 1] - self.bandwidth_up[0]) / elapsed
+            bw_down = (
+                self.bandwidth_down[n_sys - 1] - self.bandwidth_down[0]
+            ) / elapsed
 
         # Duration in seconds derived from frame timestamps
         duration_seconds = 0
-        if len(self.frame_times) >= 2:
-            duration_seconds = (self.frame_times[-1] - self.frame_times[0]) / 1000.0
-
-        # Compute percentiles
-        p95 = (
-            round(statistics.quantiles(self.latencies, n=100)[94], 2)
-            if len(self.latencies) >= 20
-            else round(max(self.latencies), 2)
-        )
+        if n >= 2:
+            duration_seconds = (self.frame_times[n - 1] - self.frame_times[0]) / 1000.0
+
+        lat = self.latencies[:n]
+        if self.latency_histogram is not None:
+            median = self.latency_histogram.get_value_at_percentile(50)
+            p95 = self.latency_histogram.get_value_at_percentile(95)
+        elif lat.size >= 20:
+            median, p95 = np.percentile(lat, [50, 95])
+        else:
+            median, p95 = np.median(lat), lat.max()
 
         return {
-            "duration_seconds": round(duration_seconds, 2),
-            "total_frames": len(self.latencies),
+            "duration_seconds": round(float(duration_seconds), 2),
+            "total_frames": int(lat.size),
             "processed_fps": round(self.calculate_fps(), 2),
             "latency_ms": {
-                "median": round(statistics.median(self.latencies), 2),
-                "p95": p95,
-                "mean": round(statistics.mean(self.latencies), 2),
-                "min": round(min(self.latencies), 2),
-                "max": round(max(self.latencies), 2),
+                "median": round(float(median), 2),
+                "p95": round(float(p95), 2),
+                "mean": round(float(lat.mean()), 2),
+                "min": round(float(lat.min()), 2),
+                "max": round(float(lat.max()), 2),
             },
-            "server_latency_ms": (
-                {
-                    "median": round(statistics.median(self.server_latencies), 2),
-                    "mean": round(statistics.mean(self.server_latencies), 2),
-                }
-                if self.server_latencies
-                else None
-            ),
-            "network_latency_ms": (
-                {
-                    "median": round(statistics.median(self.network_latencies), 2),
-                    "mean": round(statistics.mean(self.network_latencies), 2),
-                }
-                if self.network_latencies
-                else None
-            ),
+            "server_latency_ms": _median_mean(self.server_latencies[:n]),
+            "network_latency_ms": _median_mean(self.network_latencies[:n]),
             "system_resources": {
-                "cpu_percent": (
-                    {
-                        "mean": round(statistics.mean(self.cpu_usage), 2),
-                        "max": round(max(self.cpu_usage), 2),
-                    }
-                    if self.cpu_usage
-                    else None
-                ),
-                "memory_percent": (
-                    {
-                        "mean": round(statistics.mean(self.memory_usage), 2),
-                        "max": round(max(self.memory_usage), 2),
-                    }
-                    if self.memory_usage
-                    else None
-                ),
+                "cpu_percent": _mean_max(self.cpu_usage[:n_sys]),
+                "memory_percent": _mean_max(self.memory_usage[:n_sys]),
             },
             "bandwidth_kbps": {
-                "uplink": round(bw_up * 8 / 1024, 2),
-                "downlink": round(bw_down * 8 / 1024, 2),
+                "uplink": round(float(bw_up) * 8 / 1024, 2),
+                "downlink": round(float(bw_down) * 8 / 1024, 2),
             },
         }
 
@@ -148,15 +281,18 @@ class BenchmarkRunner:
     def __init__(self, duration: int, mode: str):
         self.duration = duration
         self.mode = mode
-        self.metrics = BenchmarkMetrics()
+        # Room for ~30 FPS over the whole run before any resize
+        self.metrics = BenchmarkMetrics(max_samples=max(1, duration) * 30)
         self.running = False
+        self._monitor_handle = None
 
     async def run_benchmark(self) -> Dict:
         """Run the benchmark"""
         print(f"Starting {self.duration}s benchmark in {self.mode} mode...")
 
         # Start system monitoring
-        monitor_task = asyncio.create_task(self.monitor_system())
+        self.running = True
+        self.monitor_system()
 
         # Connect to WebSocket and simulate video stream
         try:
@@ -168,16 +304,20 @@ class BenchmarkRunner:
             print(f"Benchmark error: {e}")
         finally:
             self.running = False
-            monitor_task.cancel()
+            if self._monitor_handle is not None:
+                self._monitor_handle.cancel()
+            self.metrics.close()
 
         return self.metrics.get_summary()
 
-    async def monitor_system(self):
-        """Monitor system resources"""
-        self.running = True
-        while self.running:
-            self.metrics.add_system_metrics()
-            await asyncio.sleep(1)
+    def monitor_system(self):
+        """Sample system resources, then reschedule itself one second later"""
+        if not self.running:
+            return
+        self.metrics.add_system_metrics()
+        self._monitor_handle = asyncio.get_running_loop().call_later(
+            1, self.monitor_system
+        )
 
     async def run_server_benchmark(self):
         """Run benchmark against server mode"""
@@ -187,28 +327,55 @@ class BenchmarkRunner:
             async with websockets.connect(uri) as websocket:
                 # Send start signal
                 await websocket.send(
-                    json.dumps({"type": "start_receiving", "mode": "server"})
+                    orjson.dumps({"type": "start_receiving", "mode": "server"})
                 )
 
-                # Simulate receiving detection results
-                start_time = time.time()
-                while time.time() - start_time < self.duration:
-                    try:
-                        message = await asyncio.wait_for(websocket.recv(), timeout=1.0)
-                        data = json.loads(message)
-
-                        if data.get("type") == "detection_result":
-                            self.metrics.add_frame_metrics(data["payload"])
-
-                    except asyncio.TimeoutError:
-                        continue
-                    except Exception as e:
-                        print(f"WebSocket error: {e}")
-                        break
+                # Receive detection results; one timeout bounds the whole run
+                # in case the server goes quiet after the deadline
+                websocket.close_timeout = 1
+                try:
+                    await asyncio.wait_for(
+                        self.receive_results(websocket), timeout=self.duration + 2
+                    )
+                except asyncio.TimeoutError:
+                    pass
 
         except Exception as e:
             print(f"Failed to connect to server: {e}")
 
+    async def receive_results(self, websocket):
+        """Record detection results until the benchmark duration elapses"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.duration
+        last_detections = []
+
+        while loop.time() < deadline:
+            try:
+                message = await websocket.recv()
+            except websockets.exceptions.ConnectionClosed:
+                break
+
+            try:
+                data = orjson.loads(message)
+
+                if data.get("type") == "clock_ref":
+                    self.metrics.clock_offset_ms = (
+                        time.monotonic_ns() // 1_000_000 - data["clock_ref"]
+                    )
+                elif data.get("type") == "detection_batch":
+                    for result in data["payload"]:
+                        # Unchanged scenes arrive as references to the
+                        # previous detections
+                        if result.get("type") == "detection_same":
+                            result["detections"] = last_detections
+                        else:
+                            last_detections = result["detections"]
+                        self.metrics.add_frame_metrics(result)
+
+            except Exception as e:
+                print(f"WebSocket error: {e}")
+                break
+
     async def run_wasm_benchmark(self):
         """Run benchmark for WASM mode"""
         # For WASM mode, we simulate the metrics since inference runs in browser
@@ -222,7 +389,7 @@ class BenchmarkRunner:
             await asyncio.sleep(0.1)
 
             frame_id += 1
-            now = int(time.time() * 1000)
+            now = time.monotonic_ns() // 1_000_000
 
             # Simulate detection result
             simulated_result = {
@@ -236,6 +403,17 @@ class BenchmarkRunner:
             self.metrics.add_frame_metrics(simulated_result)
 
 
+def run_async(coro):
+    """Run a coroutine on uvloop when it is installed, else the default loop"""
+    if uvloop is None:
+        return asyncio.run(coro)
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            return runner.run(coro)
+    uvloop.install()
+    return asyncio.run(coro)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Benchmark WebRTC Object Detection")
     parser.add_argument(
@@ -264,11 +442,11 @@ def main():
     runner = BenchmarkRunner(args.duration, args.mode)
 
     try:
-        results = asyncio.run(runner.run_benchmark())
+        results = run_async(runner.run_benchmark())
 
         # Save results
-        with open(args.output, "w") as f:
-            json.dump(results, f, indent=2)
+        with open(args.output, "wb") as f:
+            f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
 
         print(f"✅ Benchmark completed! Results saved to {args.output}")
 
@@ -24,6 +24,19 @@ if [ -f "models/yolov5n.onnx" ]; then
     # Copy for WASM use (quantization would be done here in production)
     cp models/yolov5n.onnx public/models/yolov5n-quantized.onnx
     echo "📦 Prepared YOLOv5n for WASM inference"
+
+    # INT8 model for server mode (needs calibration images)
+    if [ -n "$CALIBRATION_DIR" ] && [ ! -f "models/yolov5n-int8.onnx" ]; then
+        if python3 server/quantize_model.py \
+            --model models/yolov5n.onnx \
+            --output models/yolov5n-int8.onnx \
+            --calibration-dir "$CALIBRATION_DIR"; then
+            # Not picked up automatically by the server
+            echo "📦 INT8 model: from server/, run main.py --model ../models/yolov5n-int8.onnx"
+        else
+            echo "⚠️  INT8 quantization failed"
+        fi
+    fi
 fi
 
 if [ -f "models/mobile-ssd-v1.onnx" ]; then
@@ -5,30 +5,171 @@ Handles WebRTC connections and runs inference on received video frames
 """
 
 import asyncio
-import json
+import sys
+import concurrent.futures
 import logging
 import time
 from typing import Dict, List, Optional
 import cv2
 import numpy as np
 import onnxruntime as ort
+import orjson
 from aiortc import RTCPeerConnection, RTCSessionDescription, VideoStreamTrack
 from aiortc.contrib.media import MediaPlayer
+from av.video.reformatter import VideoReformatter
 import websockets
+from websockets import broadcast
 from websockets.server import serve
 import argparse
 import os
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Queued detection results are coalesced into one WebSocket frame, up to
+# this many per batch. Nothing waits to fill a batch: results are sent as
+# soon as they arrive, and batches only form when the sender falls behind
+# the inference worker
+RESULT_BATCH_SIZE = 4
+RESULT_QUEUE_SIZE = 16
+
+# IoU above which overlapping boxes of the same class are suppressed
+NMS_IOU_THRESHOLD = 0.45
+
+# COCO class names
+CLASS_NAMES = (
+    "person",
+    "bicycle",
+    "car",
+    "motorcycle",
+    "airplane",
+    "bus",
+    "train",
+    "truck",
+    "boat",
+    "traffic light",
+    "fire hydrant",
+    "stop sign",
+    "parking meter",
+    "bench",
+    "bird",
+    "cat",
+    "dog",
+    "horse",
+    "sheep",
+    "cow",
+    "elephant",
+    "bear",
+    "zebra",
+    "giraffe",
+    "backpack",
+    "umbrella",
+    "handbag",
+    "tie",
+    "suitcase",
+    "frisbee",
+    "skis",
+    "snowboard",
+    "sports ball",
+    "kite",
+    "baseball bat",
+    "baseball glove",
+    "skateboard",
+    "surfboard",
+    "tennis racket",
+    "bottle",
+    "wine glass",
+    "cup",
+    "fork",
+    "knife",
+    "spoon",
+    "bowl",
+    "banana",
+    "apple",
+    "sandwich",
+    "orange",
+    "broccoli",
+    "carrot",
+    "hot dog",
+    "pizza",
+    "donut",
+    "cake",
+    "chair",
+    "couch",
+    "potted plant",
+    "bed",
+    "dining table",
+    "toilet",
+    "tv",
+    "laptop",
+    "mouse",
+    "remote",
+    "keyboard",
+    "cell phone",
+    "microwave",
+    "oven",
+    "toaster",
+    "sink",
+    "refrigerator",
+    "book",
+    "clock",
+    "vase",
+    "scissors",
+    "teddy bear",
+    "hair drier",
+    "toothbrush",
+)
+NUM_CLASSES = len(CLASS_NAMES)
+
 
 class ObjectDetector:
     def __init__(self, model_path: str, input_size: int = 320):
         self.input_size = input_size
-        self.session = ort.InferenceSession(model_path)
-        self.input_name = self.session.get_inputs()[0].name
+
+        # Leave one core for the event loop thread
+        sess_options = ort.SessionOptions()
+        sess_options.intra_op_num_threads = max(1, (os.cpu_count() or 2) - 1)
+        sess_options.inter_op_num_threads = 1
+        sess_options.graph_optimization_level = (
+            ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        sess_options.enable_mem_pattern = True
+        sess_options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # Idle ORT workers sleep instead of spinning on the event loop's CPU
+        sess_options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+
+        # Prefer OpenVINO on Intel CPUs (fast INT8 kernels), fall back to CPU
+        providers = ["CPUExecutionProvider"]
+        if "OpenVINOExecutionProvider" in ort.get_available_providers():
+            providers.insert(
+                0, ("OpenVINOExecutionProvider", {"device_type": "CPU_FP32"})
+            )
+        self.session = ort.InferenceSession(
+            model_path, sess_options, providers=providers
+        )
+        logger.info(f"Execution providers: {self.session.get_providers()}")
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+
+        # Fixed-shape exports only accept their own size, so the requested
+        # size must give way before any buffers are bound
+        height, width = model_input.shape[-2:]
+        if isinstance(height, int) and isinstance(width, int):
+            if height != width:
+                raise ValueError(f"Unsupported non-square model input {height}x{width}")
+            if height != input_size:
+                logger.warning(
+                    f"Model input is fixed at {height}x{width}, "
+                    f"ignoring requested input size {input_size}"
+                )
+                self.input_size = height
         self.output_names = [output.name for output in self.session.get_outputs()]
         # Log model input/output metadata for debugging
         try:
@@ -38,105 +179,97 @@ class ObjectDetector:
         except Exception:
             logger.debug("Could not read model metadata")
 
-        # COCO class names
-        self.class_names = [
-            "person",
-            "bicycle",
-            "car",
-            "motorcycle",
-            "airplane",
-            "bus",
-            "train",
-            "truck",
-            "boat",
-            "traffic light",
-            "fire hydrant",
-            "stop sign",
-            "parking meter",
-            "bench",
-            "bird",
-            "cat",
-            "dog",
-            "horse",
-            "sheep",
-            "cow",
-            "elephant",
-            "bear",
-            "zebra",
-            "giraffe",
-            "backpack",
-            "umbrella",
-            "handbag",
-            "tie",
-            "suitcase",
-            "frisbee",
-            "skis",
-            "snowboard",
-            "sports ball",
-            "kite",
-            "baseball bat",
-            "baseball glove",
-            "skateboard",
-            "surfboard",
-            "tennis racket",
-            "bottle",
-            "wine glass",
-            "cup",
-            "fork",
-            "knife",
-            "spoon",
-            "bowl",
-            "banana",
-            "apple",
-            "sandwich",
-            "orange",
-            "broccoli",
-            "carrot",
-            "hot dog",
-            "pizza",
-            "donut",
-            "cake",
-            "chair",
-            "couch",
-            "potted plant",
-            "bed",
-            "dining table",
-            "toilet",
-            "tv",
-            "laptop",
-            "mouse",
-            "remote",
-            "keyboard",
-            "cell phone",
-            "microwave",
-            "oven",
-            "toaster",
-            "sink",
-            "refrigerator",
-            "book",
-            "clock",
-            "vase",
-            "scissors",
-            "teddy bear",
-            "hair drier",
-            "toothbrush",
-        ]
+        # Preallocated preprocessing buffers, bound once to the session so each
+        # frame is written in place instead of allocating a new input tensor
+        size = self.input_size
+        self._resized_bgr = np.empty((size, size, 3), dtype=np.uint8)
+        self._in_hwc = np.empty((size, size, 3), dtype=np.float32)
+        self._in = np.empty((1, 3, size, size), dtype=np.float32)
+        self._io = self.session.io_binding()
+        self._io.bind_input(
+            self.input_name,
+            "cpu",
+            0,
+            np.float32,
+            self._in.shape,
+            self._in.ctypes.data,
+        )
+        for name in self.output_names:
+            self._io.bind_output(name, "cpu")
 
-    def preprocess(self, frame: np.ndarray) -> np.ndarray:
-        """Preprocess frame for YOLO inference"""
-        # Resize to input size
-        resized = cv2.resize(frame, (self.input_size, self.input_size))
+        self.class_names = CLASS_NAMES
 
-        # Convert BGR to RGB
-        rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
+        # Pay graph optimization and arena allocation costs up front
+        self.warmup()
+
+    def warmup(self):
+        """Run one inference on a blank input"""
+        start_time = time.time()
+        self._in.fill(0)
+        self.session.run_with_iobinding(self._io)
+        logger.info(f"Warmup inference: {(time.time() - start_time) * 1000:.2f}ms")
+
+    def preprocess(
+        self, frame: np.ndarray, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Preprocess frame for YOLO inference, writing into a reusable buffer"""
+        if out is None:
+            out = self._in
+
+        # Resize to input size, unless the frame was already scaled upstream
+        if frame.shape[:2] == (self.input_size, self.input_size):
+            resized = frame
+        else:
+            resized = cv2.resize(
+                frame, (self.input_size, self.input_size), dst=self._resized_bgr
+            )
+
+        # BGR to RGB as a reversed-channel view, no copy
+        rgb = resized[..., ::-1]
 
         # Normalize to [0, 1]
-        normalized = rgb.astype(np.float32) / 255.0
+        np.multiply(rgb, 1 / 255.0, out=self._in_hwc, dtype=np.float32)
+
+        # Transpose to CHW format into the batch slot
+        out[0] = self._in_hwc.transpose(2, 0, 1)
 
-        # Transpose to CHW format and add batch dimension
-        input_tensor = np.transpose(normalized, (2, 0, 1))[np.newaxis, ...]
+        return out
+
+    def _build_detections(
+        self, class_ids: np.ndarray, scores: np.ndarray, boxes: np.ndarray
+    ) -> List[Dict]:
+        """Convert filtered detection arrays to the result dict format"""
+        return [
+            {
+                "label": (
+                    CLASS_NAMES[class_id] if 0 <= class_id < NUM_CLASSES else "unknown"
+                ),
+                "score": score,
+                "xmin": xmin,
+                "ymin": ymin,
+                "xmax": xmax,
+                "ymax": ymax,
+            }
+            for class_id, score, (xmin, ymin, xmax, ymax) in zip(
+                class_ids.tolist(), scores.tolist(), boxes.tolist()
+            )
+        ]
 
-        return input_tensor
+    def _nms(
+        self, boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray
+    ) -> np.ndarray:
+        """Return indices of boxes ([xmin, ymin, xmax, ymax]) surviving per-class NMS"""
+        if len(boxes) == 0:
+            return np.empty(0, dtype=np.int64)
+        xywh = np.column_stack((boxes[:, :2], boxes[:, 2:] - boxes[:, :2]))
+        keep = cv2.dnn.NMSBoxesBatched(
+            xywh.tolist(),
+            scores.tolist(),
+            class_ids.tolist(),
+            0.0,
+            NMS_IOU_THRESHOLD,
+        )
+        return np.asarray(keep, dtype=np.int64).reshape(-1)
 
     def postprocess(
         self, outputs: List[np.ndarray], conf_threshold: float = 0.5
@@ -155,44 +288,31 @@ class ObjectDetector:
                 logger.debug(
                     f"Interpreting output as YOLO-style with {preds.shape[0]} predictions"
                 )
-                for pred in preds:
-                    x_center, y_center, width, height = pred[:4]
-                    confidence = float(pred[4])
-                    class_scores = pred[5:]
-
-                    if confidence <= conf_threshold:
-                        continue
-
-                    class_id = (
-                        int(np.argmax(class_scores)) if class_scores.size > 0 else 0
-                    )
-                    class_score = (
-                        float(class_scores[class_id]) if class_scores.size > 0 else 1.0
-                    )
-
-                    if class_score <= conf_threshold:
-                        continue
-
-                    xmin = max(0, (x_center - width / 2) / self.input_size)
-                    ymin = max(0, (y_center - height / 2) / self.input_size)
-                    xmax = min(1, (x_center + width / 2) / self.input_size)
-                    ymax = min(1, (y_center + height / 2) / self.input_size)
+                # Filter on objectness first so only a handful of rows remain
+                preds = preds[preds[:, 4] > conf_threshold]
+                confidence = preds[:, 4]
+                class_scores = preds[:, 5:]
+
+                class_ids = class_scores.argmax(axis=1)
+                class_score = class_scores[np.arange(len(preds)), class_ids]
+
+                keep = class_score > conf_threshold
+                preds = preds[keep]
+                class_ids = class_ids[keep]
+                scores = confidence[keep] * class_score[keep]
+
+                half_wh = preds[:, 2:4] / 2
+                boxes = np.clip(
+                    np.hstack((preds[:, :2] - half_wh, preds[:, :2] + half_wh))
+                    / self.input_size,
+                    0,
+                    1,
+                )
 
-                    detections.append(
-                        {
-                            "label": (
-                                self.class_names[class_id]
-                                if class_id < len(self.class_names)
-                                else "unknown"
-                            ),
-                            "score": float(confidence * class_score),
-                            "xmin": float(xmin),
-                            "ymin": float(ymin),
-                            "xmax": float(xmax),
-                            "ymax": float(ymax),
-                        }
-                    )
-                return detections
+                keep = self._nms(boxes, scores, class_ids)
+                return self._build_detections(
+                    class_ids[keep], scores[keep], boxes[keep]
+                )
 
             # SSD-style: sometimes outputs as [1, 1, N, 7] where last dim is [batch_id, class, conf, xmin, ymin, xmax, ymax]
             if out0.ndim == 4 and out0.shape[2] == 1 and out0.shape[3] >= 7:
@@ -200,71 +320,26 @@ class ObjectDetector:
                 logger.debug(
                     f"Interpreting output as SSD-style with {pred_box.shape[0]} predictions"
                 )
-                for row in pred_box:
-                    # Depending on export, columns may vary; try common ordering
-                    # Some implementations: [batch_id, class, score, xmin, ymin, xmax, ymax]
-                    try:
-                        class_id = int(row[1])
-                        score = float(row[2])
-                        xmin = float(row[3])
-                        ymin = float(row[4])
-                        xmax = float(row[5])
-                        ymax = float(row[6])
-                    except Exception:
-                        continue
-
-                    if score <= conf_threshold:
-                        continue
-
-                    detections.append(
-                        {
-                            "label": (
-                                self.class_names[class_id]
-                                if class_id < len(self.class_names)
-                                else "unknown"
-                            ),
-                            "score": float(score),
-                            "xmin": float(xmin),
-                            "ymin": float(ymin),
-                            "xmax": float(xmax),
-                            "ymax": float(ymax),
-                        }
-                    )
-                return detections
+                # Some implementations: [batch_id, class, score, xmin, ymin, xmax, ymax]
+                pred_box = pred_box[pred_box[:, 2] > conf_threshold]
+                return self._build_detections(
+                    pred_box[:, 1].astype(np.int64), pred_box[:, 2], pred_box[:, 3:7]
+                )
 
             # Fallback: try flattened [num*6] as [x,y,w,h,conf,class]
             flat = out0.flatten()
             if flat.size % 6 == 0:
-                num = flat.size // 6
-                for i in range(num):
-                    off = i * 6
-                    x = float(flat[off])
-                    y = float(flat[off + 1])
-                    w = float(flat[off + 2])
-                    h = float(flat[off + 3])
-                    conf = float(flat[off + 4])
-                    cls = int(flat[off + 5])
-                    if conf <= conf_threshold:
-                        continue
-                    xmin = max(0, x - w / 2)
-                    ymin = max(0, y - h / 2)
-                    xmax = min(1, x + w / 2)
-                    ymax = min(1, y + h / 2)
-                    detections.append(
-                        {
-                            "label": (
-                                self.class_names[cls]
-                                if cls < len(self.class_names)
-                                else "unknown"
-                            ),
-                            "score": conf,
-                            "xmin": float(xmin),
-                            "ymin": float(ymin),
-                            "xmax": float(xmax),
-                            "ymax": float(ymax),
-                        }
-                    )
-                return detections
+                rows = flat.reshape(-1, 6)
+                rows = rows[rows[:, 4] > conf_threshold]
+                half_wh = rows[:, 2:4] / 2
+                boxes = np.clip(
+                    np.hstack((rows[:, :2] - half_wh, rows[:, :2] + half_wh)), 0, 1
+                )
+                class_ids = rows[:, 5].astype(np.int64)
+                keep = self._nms(boxes, rows[:, 4], class_ids)
+                return self._build_detections(
+                    class_ids[keep], rows[keep, 4], boxes[keep]
+                )
 
         except Exception as e:
             logger.exception(f"Error in postprocess: {e}")
@@ -276,11 +351,12 @@ class ObjectDetector:
         """Run object detection on a frame"""
         start_time = time.time()
 
-        # Preprocess
-        input_tensor = self.preprocess(frame)
+        # Preprocess into the bound input buffer
+        self.preprocess(frame)
 
         # Run inference
-        outputs = self.session.run(self.output_names, {self.input_name: input_tensor})
+        self.session.run_with_iobinding(self._io)
+        outputs = self._io.copy_outputs_to_cpu()
 
         # Postprocess
         detections = self.postprocess(outputs)
@@ -298,17 +374,39 @@ class VideoProcessor:
         self.detector = detector
         self.frame_queue = asyncio.Queue(maxsize=5)  # Backpressure control
         self.processing = False
+        # Single worker keeps inference serialized off the event loop
+        self._exec = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        # Set while a frame is being inferred; new frames are dropped meanwhile
+        self.in_flight = False
+        # Duration of the most recent inference, used to adapt frame skipping
+        self.inference_ms = 0.0
+        # Shared so the libswscale context is reused across frames
+        self._reformatter = VideoReformatter()
+
+    def frame_to_ndarray(self, frame) -> np.ndarray:
+        """Convert a decoded video frame to a BGR array at model input size"""
+        size = self.detector.input_size
+        return self._reformatter.reformat(
+            frame, width=size, height=size, format="bgr24"
+        ).to_ndarray()
+
+    async def warmup(self):
+        """Warm up the detector on the inference thread"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._exec, self.detector.warmup)
 
     async def process_frame(
         self, frame: np.ndarray, frame_id: str, capture_ts: int
     ) -> Dict:
         """Process a single frame and return detection results"""
-        recv_ts = int(time.time() * 1000)
+        recv_ts = time.monotonic_ns() // 1_000_000
 
-        # Run detection
-        detections = self.detector.detect(frame)
+        # Run detection in the inference thread
+        loop = asyncio.get_running_loop()
+        detections = await loop.run_in_executor(self._exec, self.detector.detect, frame)
 
-        inference_ts = int(time.time() * 1000)
+        inference_ts = time.monotonic_ns() // 1_000_000
+        self.inference_ms = inference_ts - recv_ts
 
         return {
             "frame_id": frame_id,
@@ -325,17 +423,34 @@ class WebRTCServer:
         self.processor = VideoProcessor(detector)
         self.peer_connections = {}
         self.websocket_connections = {}
+        # Hash of the last detections broadcast in full, for static-scene dedup
+        self._last_det_hash = None
 
     async def handle_websocket(self, websocket, path):
-        """Handle WebSocket connections for signaling"""
+        """Handle WebSocket connections for signaling
+
+        Messages are orjson-encoded JSON sent as binary frames in both
+        directions, which skips UTF-8 validation of text frames. Text frames
+        are still accepted.
+        """
         connection_id = id(websocket)
         self.websocket_connections[connection_id] = websocket
+        # New subscribers need full detections before any references
+        self.reset_dedup()
 
         logger.info(f"WebSocket connected: {connection_id}")
 
         try:
+            # Timestamps are monotonic ms; share the reference so clients can
+            # map them onto their own clock
+            await websocket.send(
+                orjson.dumps(
+                    {"type": "clock_ref", "clock_ref": time.monotonic_ns() // 1_000_000}
+                )
+            )
+
             async for message in websocket:
-                await self.handle_message(websocket, json.loads(message))
+                await self.handle_message(websocket, orjson.loads(message))
         except websockets.exceptions.ConnectionClosed:
             logger.info(f"WebSocket disconnected: {connection_id}")
         finally:
@@ -372,13 +487,13 @@ class WebRTCServer:
         async def on_track(track):
             logger.info(f"Received track: {track.kind}")
             if track.kind == "video":
-                await self.process_video_track(websocket, track)
+                await self.process_video_track(track)
 
         @pc.on("icecandidate")
         async def on_icecandidate(candidate):
             if candidate:
                 await websocket.send(
-                    json.dumps(
+                    orjson.dumps(
                         {
                             "type": "ice_candidate",
                             "payload": {
@@ -401,7 +516,7 @@ class WebRTCServer:
 
         # Send answer
         await websocket.send(
-            json.dumps(
+            orjson.dumps(
                 {
                     "type": "answer",
                     "payload": {
@@ -433,39 +548,151 @@ class WebRTCServer:
         logger.info(f"Starting to receive video in {mode} mode")
         # This would be handled by the offer/answer flow
 
-    async def process_video_track(self, websocket, track):
+    def compact_result(self, result: Dict) -> Dict:
+        """Replace detections identical to the last sent ones with a reference
+
+        Clients reuse their previous detections on a "detection_same" entry.
+        Only call this on results that are about to be broadcast, in send
+        order, so the reference always matches what clients last received.
+        """
+        det_hash = hash(
+            tuple(
+                (
+                    d["label"],
+                    round(d["xmin"], 3),
+                    round(d["ymin"], 3),
+                    round(d["xmax"], 3),
+                    round(d["ymax"], 3),
+                )
+                for d in result["detections"]
+            )
+        )
+        if det_hash != self._last_det_hash:
+            self._last_det_hash = det_hash
+            return result
+
+        return {
+            "type": "detection_same",
+            "frame_id": result["frame_id"],
+            "capture_ts": result["capture_ts"],
+            "recv_ts": result["recv_ts"],
+            "inference_ts": result["inference_ts"],
+        }
+
+    def reset_dedup(self):
+        """Force the next result to carry its detections in full"""
+        self._last_det_hash = None
+
+    async def send_result_batches(self, queue: asyncio.Queue):
+        """Drain queued detection results and broadcast them in batches
+
+        A None entry marks the end of the track; results queued before it
+        are still sent.
+        """
+        done = False
+        while not done:
+            result = await queue.get()
+            if result is None:
+                return
+            batch = [result]
+            while not queue.empty() and len(batch) < RESULT_BATCH_SIZE:
+                result = queue.get_nowait()
+                if result is None:
+                    done = True
+                    break
+                batch.append(result)
+
+            # Compact at send time, the only point where it is known what
+            # clients have received; then encode once for every subscriber
+            batch = [self.compact_result(r) for r in batch]
+            payload = orjson.dumps({"type": "detection_batch", "payload": batch})
+            broadcast(list(self.websocket_connections.values()), payload)
+
+    async def process_video_track(self, track):
         """Process incoming video track"""
+        result_queue = asyncio.Queue(maxsize=RESULT_QUEUE_SIZE)
+        sender_task = asyncio.create_task(self.send_result_batches(result_queue))
+
+        try:
+            await self._process_video_frames(track, result_queue)
+        finally:
+            # Let the sender flush whatever is still queued
+            await result_queue.put(None)
+            await sender_task
+
+    async def _process_video_frames(self, track, result_queue: asyncio.Queue):
+        """Receive frames from the track and queue detection results"""
         frame_count = 0
+        frame_interval_ms = 1000 / 30
+        last_frame_time = None
+        last_dispatched = 0
+        inference_task = None
 
         while True:
             try:
                 frame = await track.recv()
                 frame_count += 1
 
-                # Convert frame to numpy array
-                img = frame.to_ndarray(format="bgr24")
-
-                # Process every nth frame to control FPS
-                if (
-                    frame_count % 2 == 0
-                ):  # Process every 2nd frame (~15 FPS from 30 FPS)
-                    frame_id = str(frame_count)
-                    capture_ts = int(time.time() * 1000)
-
-                    # Process frame
-                    result = await self.processor.process_frame(
-                        img, frame_id, capture_ts
+                # Smoothed source frame interval
+                now = time.monotonic()
+                if last_frame_time is not None:
+                    frame_interval_ms = (
+                        0.9 * frame_interval_ms + 0.1 * (now - last_frame_time) * 1000
                     )
+                last_frame_time = now
 
-                    # Send result back
-                    await websocket.send(
-                        json.dumps({"type": "detection_result", "payload": result})
-                    )
+                # Drop frames while inference is busy to keep latency bounded
+                if self.processor.in_flight:
+                    continue
+
+                # Space dispatches by roughly one inference time, counted from
+                # the last dispatched frame so this does not stack with the
+                # in-flight drop above
+                target_skip = max(
+                    1, round(self.processor.inference_ms / frame_interval_ms)
+                )
+                if frame_count - last_dispatched < target_skip:
+                    continue
+                last_dispatched = frame_count
+
+                # Scale and convert straight from YUV to a model-sized BGR array
+                img = self.processor.frame_to_ndarray(frame)
+                frame_id = str(frame_count)
+                capture_ts = time.monotonic_ns() // 1_000_000
+
+                self.processor.in_flight = True
+                inference_task = asyncio.create_task(
+                    self._infer_and_queue(img, frame_id, capture_ts, result_queue)
+                )
 
             except Exception as e:
                 logger.error(f"Error processing video frame: {e}")
                 break
 
+        if inference_task is not None:
+            await inference_task
+
+    async def _infer_and_queue(
+        self,
+        img: np.ndarray,
+        frame_id: str,
+        capture_ts: int,
+        result_queue: asyncio.Queue,
+    ):
+        """Run detection on one frame and queue the result for sending"""
+        try:
+            result = await self.processor.process_frame(img, frame_id, capture_ts)
+
+            # Queue result for the batch sender, dropping the oldest
+            # result if the client is not keeping up
+            if result_queue.full():
+                result_queue.get_nowait()
+            result_queue.put_nowait(result)
+        except Exception as e:
+            logger.error(f"Error running detection: {e}")
+        finally:
+            self.processor.in_flight = False
+
 
 async def main():
     parser = argparse.ArgumentParser(description="WebRTC Object Detection Server")
@@ -475,19 +702,43 @@ async def main():
     parser.add_argument("--host", default="localhost", help="Host to bind to")
     parser.add_argument("--port", default=8765, type=int, help="Port to bind to")
     parser.add_argument("--input-size", default=320, type=int, help="Model input size")
+    parser.add_argument(
+        "--fast-size",
+        type=int,
+        help="Use a smaller input size (e.g. 192) and its <model>-<size>.onnx export",
+    )
 
     args = parser.parse_args()
 
+    # Fast mode swaps in a model exported at the reduced input size
+    if args.fast_size:
+        stem, ext = os.path.splitext(args.model)
+        fast_model = f"{stem}-{args.fast_size}{ext}"
+        if os.path.exists(fast_model):
+            args.model = fast_model
+        else:
+            logger.warning(
+                f"Fast model not found: {fast_model}, using {args.model}; "
+                f"input size {args.fast_size} only applies if its input "
+                f"shape is dynamic"
+            )
+        args.input_size = args.fast_size
+
     # Initialize detector
     if not os.path.exists(args.model):
         logger.error(f"Model file not found: {args.model}")
         return
 
-    detector = ObjectDetector(args.model, args.input_size)
-    logger.info(f"Loaded model: {args.model}")
+    try:
+        detector = ObjectDetector(args.model, args.input_size)
+    except ValueError as e:
+        logger.error(f"Cannot use model {args.model}: {e}")
+        return
+    logger.info(f"Loaded model: {args.model} (input size {detector.input_size})")
 
     # Initialize server
     server = WebRTCServer(detector)
+    await server.processor.warmup()
 
     # Simple HTTP health check handler
     async def health_check_handler(websocket, path):
@@ -498,16 +749,34 @@ async def main():
                 "model_loaded": detector is not None,
                 "version": "1.0.0",
             }
-            await websocket.send(json.dumps(health_response))
+            await websocket.send(orjson.dumps(health_response))
             return
         else:
             await server.handle_websocket(websocket, path)
 
-    # Start WebSocket server with health check
+    # Start WebSocket server with health check. Messages are small JSON
+    # documents, so per-message deflate costs more than it saves
     logger.info(f"Starting WebRTC server on {args.host}:{args.port}")
-    async with serve(health_check_handler, args.host, args.port):
+    async with serve(
+        health_check_handler,
+        args.host,
+        args.port,
+        max_size=2**20,
+        compression=None,
+    ):
         await asyncio.Future()  # Run forever
 
 
+def run_async(coro):
+    """Run a coroutine on uvloop when it is installed, else the default loop"""
+    if uvloop is None:
+        return asyncio.run(coro)
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            return runner.run(coro)
+    uvloop.install()
+    return asyncio.run(coro)
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_async(main())
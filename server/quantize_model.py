@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Static INT8 quantization for the YOLO ONNX model
+Calibrates on a directory of sample images (e.g. a small COCO subset)
+"""
+
+import argparse
+import glob
+import os
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    QuantFormat,
+    QuantType,
+    quantize_static,
+)
+
+
+class ImageCalibrationReader(CalibrationDataReader):
+    def __init__(
+        self, model_path: str, image_dir: str, input_size: Optional[int] = None
+    ):
+        session = ort.InferenceSession(model_path)
+        model_input = session.get_inputs()[0]
+        self.input_name = model_input.name
+
+        # Fixed-shape exports (e.g. [1, 3, 640, 640]) dictate the size
+        model_size = model_input.shape[-1]
+        if isinstance(model_size, int):
+            if input_size is not None and input_size != model_size:
+                print(
+                    f"⚠️  Model input is fixed at {model_size}, "
+                    f"ignoring --input-size {input_size}"
+                )
+            input_size = model_size
+        self.input_size = input_size or 320
+        self.images: List[str] = sorted(
+            glob.glob(os.path.join(image_dir, "*.jpg"))
+            + glob.glob(os.path.join(image_dir, "*.png"))
+        )
+        self.index = 0
+
+    def preprocess(self, frame: np.ndarray) -> np.ndarray:
+        """Match ObjectDetector.preprocess for float models"""
+        resized = cv2.resize(frame, (self.input_size, self.input_size))
+        rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
+        normalized = rgb.astype(np.float32) / 255.0
+        return np.transpose(normalized, (2, 0, 1))[np.newaxis, ...]
+
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        while self.index < len(self.images):
+            frame = cv2.imread(self.images[self.index])
+            self.index += 1
+            if frame is not None:
+                return {self.input_name: self.preprocess(frame)}
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize ONNX model to INT8")
+    parser.add_argument(
+        "--model", default="models/yolov5n.onnx", help="Path to FP32 ONNX model"
+    )
+    parser.add_argument(
+        "--output", default="models/yolov5n-int8.onnx", help="Output model path"
+    )
+    parser.add_argument(
+        "--calibration-dir", required=True, help="Directory of calibration images"
+    )
+    parser.add_argument(
+        "--input-size",
+        type=int,
+        help="Model input size (defaults to the model's own, or 320 if dynamic)",
+    )
+
+    args = parser.parse_args()
+
+    reader = ImageCalibrationReader(args.model, args.calibration_dir, args.input_size)
+    if not reader.images:
+        print(f"❌ No calibration images found in {args.calibration_dir}")
+        return
+
+    quantize_static(
+        args.model,
+        args.output,
+        reader,
+        quant_format=QuantFormat.QOperator,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    print(f"✅ Quantized model saved to {args.output}")
+    print(
+        "   Start the server with: "
+        f"python main.py --model {os.path.abspath(args.output)}"
+    )
+
+
+if __name__ == "__main__":
+    main()